@@ -39,6 +39,23 @@ public class TestDaemon {
         while (!input.equals("exit")) {
             // separate out the params
             String[] parts = input.split(" ");
+
+            if (parts[0].equals("chdir")) {
+                // Point the runtime ClassLoader at a different directory
+                // (relative to the working directory) for subsequent
+                // commands. This lets the test suite pipeline several runs
+                // of the same class name from different directories in a
+                // single write, and read the framed outputs back in order.
+                try {
+                    runtimeURLs[0] = new URL(
+                            "file:" + System.getProperty("user.dir") + "/" + parts[1] + "/");
+                } catch (MalformedURLException e) {
+                    e.printStackTrace();
+                }
+                input = sc.nextLine();
+                continue;
+            }
+
             String className = parts[0];
             String[] inputArgs = Arrays.copyOfRange(parts, 1, parts.length);
 
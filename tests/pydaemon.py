@@ -0,0 +1,96 @@
+"""A long-lived Python process that runs test scripts on demand.
+
+This is the Python-side counterpart of ``python.testdaemon.TestDaemon``:
+rather than paying interpreter startup for every test, the test suite
+keeps one of these processes alive, writes the path of a test script to
+its stdin, and reads the script's output from stdout until a line
+containing a single ``.`` marks the end of the run.
+"""
+import os
+import sys
+import traceback
+
+
+class _LineTrackingStdout:
+    """A stdout wrapper that remembers whether output ends a line.
+
+    The end-of-run marker must start on its own line for the test suite
+    to find it, but a script is free to leave its last line unterminated
+    (``print(..., end='')``); the daemon consults this wrapper to know
+    when it has to supply the newline itself.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.at_line_start = True
+
+    def write(self, text):
+        if text:
+            self.at_line_start = text.endswith('\n')
+        return self.stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def run_script(path):
+    """Execute a test script as if it had been run as __main__."""
+    directory, filename = os.path.split(path)
+
+    # Match the environment of `python test.py` run from the test
+    # directory: imports resolve against the script's directory, and
+    # the script sees a relative __file__/argv.
+    os.chdir(directory)
+    sys.path[0] = directory
+    sys.argv = [filename]
+
+    try:
+        with open(filename, encoding='utf-8') as source:
+            code = compile(source.read(), filename, 'exec')
+    except SyntaxError:
+        # A top-level syntax error is reported without a traceback.
+        exc_type, exc_value, _ = sys.exc_info()
+        traceback.print_exception(exc_type, exc_value, None, file=sys.stdout)
+        return
+
+    # Snapshot the module cache so anything the script imports can be
+    # purged afterwards; the Java daemon does the same with python.sys.
+    modules = set(sys.modules)
+
+    try:
+        exec(code, {'__name__': '__main__', '__file__': filename})
+    except SystemExit as e:
+        # A standalone interpreter would exit silently for integer
+        # codes, and print any other non-None code.
+        if e.code is not None and not isinstance(e.code, int):
+            print(e.code)
+    except BaseException:
+        # Drop this function's own frame so the traceback matches what
+        # a standalone interpreter would have printed.
+        exc_type, exc_value, tb = sys.exc_info()
+        traceback.print_exception(exc_type, exc_value, tb.tb_next, file=sys.stdout)
+    finally:
+        for name in set(sys.modules) - modules:
+            del sys.modules[name]
+
+
+def main():
+    # The test suite compares Java and Python output with stderr
+    # redirected into stdout; do the same here.
+    sys.stdout = _LineTrackingStdout(sys.stdout)
+    sys.stderr = sys.stdout
+
+    while True:
+        line = sys.stdin.readline()
+        if not line or line.strip() == 'exit':
+            break
+
+        run_script(line.strip())
+
+        if not sys.stdout.at_line_start:
+            sys.stdout.write('\n')
+        sys.stdout.write('.\n')
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,7 @@
 import atexit
+import concurrent.futures
 import contextlib
+import functools
 from io import StringIO, BytesIO
 import os
 import re
@@ -12,6 +14,14 @@ import traceback
 from unittest import TestCase
 from itertools import permutations
 
+try:
+    # An optional DFA-backed regex engine. Matching is guaranteed linear
+    # in the input, which protects the exception normalization against
+    # backtracking blowups on large Java outputs.
+    import re2
+except ImportError:
+    re2 = None
+
 from voc.python.blocks import Block as PyBlock
 from voc.python.modules import Module as PyModule
 from voc.java.constants import ConstantPool, Utf8
@@ -23,6 +33,13 @@ from voc.transpiler import Transpiler
 # get path to `tests` directory
 TESTS_DIR = os.path.dirname(__file__)
 
+# Jars and directories used on Java classpaths, resolved once; the test
+# suite is always run from the project root, where `dist` lives.
+_SUPPORT_JAR = os.path.abspath(os.path.join('dist', 'python-java-support.jar'))
+_TESTDAEMON_JAR = os.path.abspath(os.path.join('dist', 'python-java-testdaemon.jar'))
+_JAVA_SUPPORT_DIR = os.path.abspath('java')
+_DAEMON_CLASSPATH = os.pathsep.join([_TESTDAEMON_JAR, _SUPPORT_JAR])
+
 # A state variable to determine if the test environment has been configured.
 _suite_configured = False
 
@@ -30,6 +47,13 @@ _suite_configured = False
 # Set during setUpSuite()
 _output_dir = ''
 
+# Long-lived Python process that runs test scripts on demand, saving an
+# interpreter startup per test (the Python analogue of the Java TestDaemon),
+# and the reader that frames its output.
+# Set during setUpSuite()
+_py_daemon = None
+_py_daemon_reader = None
+
 
 def setUpSuite():
     """Configure the entire test suite.
@@ -41,6 +65,8 @@ def setUpSuite():
     into the test environment.
     """
     global _output_dir
+    global _py_daemon
+    global _py_daemon_reader
     global _suite_configured
 
     if _suite_configured:
@@ -54,9 +80,31 @@ def setUpSuite():
             except FileNotFoundError:
                 pass
 
+    def stop_py_daemon():
+        global _py_daemon
+        if _py_daemon is not None:
+            # use communicate here to wait for process to exit
+            _py_daemon.communicate("exit".encode("utf-8"))
+            _py_daemon = None
+
     atexit.register(remove_output_dir)
     _output_dir = tempfile.mkdtemp(dir=TESTS_DIR)
 
+    # Tree operations are expensive, so directories live as long as the
+    # suite (or, for 'temp', the test class); tests just overwrite the
+    # sources inside them. The JVM daemon resolves 'temp' and 'java'
+    # relative to its working directory, so the names are fixed.
+    os.mkdir(os.path.join(_output_dir, 'java'))
+
+    atexit.register(stop_py_daemon)
+    _py_daemon = subprocess.Popen(
+        [sys.executable, "-u", os.path.join(TESTS_DIR, "pydaemon.py")],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
+    _py_daemon_reader = _DaemonReader(_py_daemon.stdout)
+
     os.environ['VOC_BUILD_DIR'] = os.path.join(_output_dir, 'build')
     os.environ['VOC_DIST_DIR'] = os.path.join(_output_dir, 'dist')
 
@@ -88,16 +136,37 @@ def setUpSuite():
     _suite_configured = True
 
 
+class _OutputSink:
+    """A minimal write-only file object that collects output in a list.
+
+    Cheaper than StringIO for capturing: each write is a plain list
+    append, and the captured text is only joined into a string if it is
+    actually read back.
+    """
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, text):
+        self._chunks.append(text)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def getvalue(self):
+        return ''.join(self._chunks)
+
+
 @contextlib.contextmanager
 def capture_output(redirect_stderr=True):
     oldout, olderr = sys.stdout, sys.stderr
     try:
-        out = StringIO()
+        out = _OutputSink()
         sys.stdout = out
         if redirect_stderr:
             sys.stderr = out
         else:
-            sys.stderr = StringIO()
+            sys.stderr = _OutputSink()
         yield out
     except:
         if redirect_stderr:
@@ -108,8 +177,15 @@ def capture_output(redirect_stderr=True):
         sys.stdout, sys.stderr = oldout, olderr
 
 
+@functools.lru_cache(maxsize=1024)
 def adjust(text, run_in_function=False):
-    """Adjust a code sample to remove leading whitespace."""
+    """Adjust a code sample to remove leading whitespace.
+
+    The same samples (templates, extra_code support modules) are
+    adjusted over and over during a test run, so results are memoized
+    on the input text; the cache is bounded to avoid pinning every
+    generated source in memory.
+    """
     lines = text.split('\n')
     if len(lines) == 1:
         return text
@@ -131,37 +207,138 @@ def adjust(text, run_in_function=False):
     return '\n'.join(final_lines)
 
 
-def runAsPython(test_dir, main_code, extra_code=None, args=None):
-    """Run a block of Python code with the Python interpreter."""
-    # Output source code into test directory
-    with open(os.path.join(test_dir, 'test.py'), 'w', encoding='utf-8') as py_source:
-        py_source.write(main_code)
+# The line a daemon emits to mark the end of one run's output.
+_FRAME_END = ('.' + os.linesep).encode('utf-8')
+
+
+class _DaemonReader:
+    """Reads framed run output from a daemon's stdout.
+
+    Drains the pipe a chunk at a time instead of a line at a time,
+    scanning for the '.' end-of-run line; anything received beyond the
+    current frame is carried over to the next read_frame() call, which
+    is what allows batched runs to share a single round-trip.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        # A bytearray appends incoming chunks in place, where bytes
+        # concatenation would copy the whole buffer on every read.
+        self.buffer = bytearray()
+        # How much of the buffer is already known not to hold a frame
+        # end; each scan resumes from here instead of from the start.
+        self.scanned = 0
+
+    def _find_frame_end(self):
+        # The marker is a line of its own: it is only valid at the very
+        # start of the frame or immediately after a newline.
+        if self.scanned < len(_FRAME_END) and self.buffer.startswith(_FRAME_END):
+            return 0
+        # Back up far enough to catch a marker straddling two chunks.
+        start = max(self.scanned - len(_FRAME_END), 0)
+        index = self.buffer.find(b'\n' + _FRAME_END, start)
+        if index == -1:
+            self.scanned = len(self.buffer)
+            return -1
+        return index + 1
+
+    def read_frame(self):
+        """Read one run's output, up to the '.' end-of-run line."""
+        while True:
+            index = self._find_frame_end()
+            if index != -1:
+                frame = bytes(self.buffer[:index])
+                del self.buffer[:index + len(_FRAME_END)]
+                self.scanned = 0
+                return frame.decode("utf-8")
+
+            data = self.stream.read1(65536)
+            if not data:
+                raise IOError(
+                    "Test daemon exited with unterminated output:\n%s" % (
+                        self.buffer.decode("utf-8", errors="replace")
+                    )
+                )
+            self.buffer += data
+
+
+# Shared pool for flushing support modules to disk; writes release the
+# GIL, so the files of a multi-module test go out concurrently.
+_write_pool = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+
+# Dedicated worker for the Python side of an assertion, so it can run
+# while the Java side runs in the calling thread. A separate pool from
+# _write_pool: the Python runner submits writes there itself.
+_py_runner = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+
+def _write_source_file(path, source):
+    with open(path, 'w', encoding='utf-8') as py_source:
+        py_source.write(source)
+
+
+def _write_python_source(test_dir, main_code, extra_code=None):
+    """Output the source code for a test run into a test directory."""
+    _write_source_file(os.path.join(test_dir, 'test.py'), main_code)
 
     if extra_code:
+        writes = []
         for name, code in extra_code.items():
             path = name.split('.')
             path[-1] = path[-1] + '.py'
             if len(path) != 1:
-                try:
-                    os.makedirs(os.path.join(test_dir, *path[:-1]))
-                except FileExistsError:
-                    pass
-            with open(os.path.join(test_dir, *path), 'w', encoding="utf-8") as py_source:
-                py_source.write(adjust(code))
+                os.makedirs(os.path.join(test_dir, *path[:-1]), exist_ok=True)
+            writes.append(_write_pool.submit(
+                _write_source_file, os.path.join(test_dir, *path), adjust(code)
+            ))
+        for write in writes:
+            write.result()
+
+
+def runAsPython(test_dir, main_code, extra_code=None, args=None):
+    """Run a block of Python code with the Python interpreter."""
+    return runAsPythonBatch([(test_dir, main_code)], extra_code, args=args)[0]
+
+
+def runAsPythonBatch(runs, extra_code=None, args=None):
+    """Run several blocks of Python code with the Python interpreter.
+
+    ``runs`` is a list of (test_dir, main_code) pairs. All runs are
+    submitted to the Python daemon in a single write, and their framed
+    outputs are read back in order, so a batch costs one round-trip
+    regardless of its size.
+    """
+    for test_dir, main_code in runs:
+        _write_python_source(test_dir, main_code, extra_code)
 
     if args is None:
         args = []
 
-    proc = subprocess.Popen(
-        [sys.executable, "test.py"] + args,
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        cwd=test_dir,
-    )
-    out = proc.communicate()
+    if len(args) == 0:
+        # Hand the test scripts to the Python daemon in one write, and
+        # drain one frame of output per script.
+        _py_daemon.stdin.write(''.join(
+            os.path.abspath(os.path.join(test_dir, 'test.py')) + "\n"
+            for test_dir, main_code in runs
+        ).encode("utf-8"))
+        _py_daemon.stdin.flush()
+
+        return [_py_daemon_reader.read_frame() for _ in runs]
+
+    # Tests that need command line arguments can't go through the
+    # daemon; fall back to one subprocess per run.
+    outs = []
+    for test_dir, main_code in runs:
+        proc = subprocess.Popen(
+            [sys.executable, "test.py"] + args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=test_dir,
+        )
+        out = proc.communicate()
+        outs.append(out[0].decode('utf8'))
 
-    return out[0].decode('utf8')
+    return outs
 
 
 def compileJava(java_dir, java):
@@ -179,10 +356,7 @@ def compileJava(java_dir, java):
             full_dir = os.path.join(java_dir, class_dir)
             full_path = os.path.join(java_dir, class_file)
 
-            try:
-                os.makedirs(full_dir)
-            except FileExistsError:
-                pass
+            os.makedirs(full_dir, exist_ok=True)
 
             with open(full_path, 'w', encoding="utf-8") as java_source:
                 java_source.write(adjust(code))
@@ -190,7 +364,7 @@ def compileJava(java_dir, java):
             sources.append(class_file)
 
     classpath = os.pathsep.join([
-        os.path.abspath(os.path.join('dist', 'python-java-support.jar')),
+        _SUPPORT_JAR,
         os.path.abspath(java_dir),
     ])
     proc = subprocess.Popen(
@@ -205,14 +379,21 @@ def compileJava(java_dir, java):
     return out[0].decode('utf8')
 
 
-JAVA_EXCEPTION = re.compile(
+JAVA_EXCEPTION_PATTERN = (
     '(((Exception in thread "[\w-]+" )?(?P<exception1>[\w]+): (?P<message1>[^\r?\n]+))|' +
     '([^\r\n]*?\r?\n((    |\t)at[^\r\n]*?\r?\n)*' +
     'Caused by: (?P<exception2>[\w]+)(?:\:\s)?(?P<message2>[^\r?]+))\r?)\n' +
     '(?P<trace>(\s+at .+\((((.*)(:(\d+))?)|(Native Method))\)\r?\n)+)(.*\r?\n)*' +
-    '(Exception in thread "\w+" )?',
-    re.MULTILINE
+    '(Exception in thread "\w+" )?'
 )
+
+if re2 is not None:
+    try:
+        JAVA_EXCEPTION = re2.compile(JAVA_EXCEPTION_PATTERN, re2.MULTILINE)
+    except re2.error:
+        JAVA_EXCEPTION = re.compile(JAVA_EXCEPTION_PATTERN, re.MULTILINE)
+else:
+    JAVA_EXCEPTION = re.compile(JAVA_EXCEPTION_PATTERN, re.MULTILINE)
 JAVA_STACK = re.compile(
     '^\s+at (?P<module>.+)\((((?P<file>.*?)(:(?P<line>\d+))?)|(Native Method))\)\r?\n',
     re.MULTILINE
@@ -226,7 +407,65 @@ PYTHON_EXCEPTION = re.compile(
 
 PYTHON_STACK = re.compile('  File "(?P<file>.*)", line (?P<line>\d+), in .*\r?\n    .*\r?\n')
 
-MEMORY_REFERENCE = re.compile('0x[\dABCDEFabcdef]{4,16}')
+_HEX_DIGITS = frozenset('0123456789ABCDEFabcdef')
+
+
+def _scrub_memory_references(text):
+    """Replace memory addresses ('0x' + 4-16 hex digits) with 0xXXXXXXXX.
+
+    Equivalent to re.sub('0x[0-9A-Fa-f]{4,16}', ...), but as a plain
+    string scan: most outputs contain no addresses at all, and find()
+    rejects those in a single pass without engaging the regex engine.
+    """
+    start = text.find('0x')
+    if start == -1:
+        return text
+
+    parts = []
+    pos = 0
+    while start != -1:
+        end = start + 2
+        limit = min(len(text), end + 16)
+        while end < limit and text[end] in _HEX_DIGITS:
+            end += 1
+        if end - start >= 6:
+            # at least 4 hex digits; replace the address, and resume
+            # the search after the consumed digits
+            parts.append(text[pos:start])
+            parts.append('0xXXXXXXXX')
+            pos = end
+            start = text.find('0x', end)
+        else:
+            # too short to be an address; resume just past this '0x',
+            # not past its hex run -- the run may itself end in a '0'
+            # that starts the next candidate
+            start = text.find('0x', start + 2)
+
+    parts.append(text[pos:])
+    return ''.join(parts)
+
+# Cache the platform's line separator, and precompute the replacement
+# templates used when normalizing exceptions; cleanse_java/cleanse_python
+# run once per test, so there's no need to rebuild these on every call.
+LINESEP = os.linesep
+
+PYTHON_EXCEPTION_REPLACEMENT = (
+    '### EXCEPTION ###%s\\g<exception>: \\g<message>' % LINESEP
+)
+
+
+def _java_exception_replacement(match):
+    """Normalize a matched Java exception, whichever form it took.
+
+    A "Caused by:" traceback populates the exception2/message2 groups;
+    a plain exception populates exception1/message1. Picking the groups
+    from the match object lets a single sub() pass handle both forms.
+    """
+    exception = match.group('exception2') or match.group('exception1')
+    message = match.group('message2') or match.group('message1')
+    return '### EXCEPTION ###%s%s: %s%s%s' % (
+        LINESEP, exception, message, LINESEP, match.group('trace')
+    )
 
 END_OF_CODE_STRING = '===end of test==='
 END_OF_CODE_STRING_NEWLINE = END_OF_CODE_STRING + '\n'
@@ -236,42 +475,31 @@ FLOAT_PRECISION = re.compile('(\\.\d{5})\d+')
 
 
 def cleanse_java(raw, substitutions):
-    matches = JAVA_EXCEPTION.search(raw)
-    if matches is not None:
-        groups = matches.groupdict()
-        if groups['exception2'] is not None:
-            # Test the specific message
-            out = JAVA_EXCEPTION.sub(
-                '### EXCEPTION ###{linesep}\\g<exception2>: \\g<message2>{linesep}\\g<trace>'.format(
-                    linesep=os.linesep
-                ),
-                raw
-            )
-        else:
-            # Test the specific message
-            out = JAVA_EXCEPTION.sub(
-                '### EXCEPTION ###{linesep}\\g<exception1>: \\g<message1>{linesep}\\g<trace>'.format(
-                    linesep=os.linesep
-                ),
-                raw
-            )
-    else:
-        out = raw
+    # Test the specific message
+    out = JAVA_EXCEPTION.sub(_java_exception_replacement, raw)
+
+    # Strip the stack lines and collect their groups in a single pass.
+    # groups('') matches what findall would have produced for
+    # unmatched groups (e.g. the line number of a Native Method frame).
+    stack = []
 
-    stack = JAVA_STACK.findall(out)
-    out = JAVA_STACK.sub('', out)
+    def collect_stack(match):
+        stack.append(match.groups(''))
+        return ''
+
+    out = JAVA_STACK.sub(collect_stack, out)
 
     out = '%s%s%s' % (
         out,
-        os.linesep.join([
+        LINESEP.join([
             "    %s:%s" % (s[3], s[5])
             for s in stack[::-1]
             if s[0].startswith('python.') and not s[0].endswith('.<init>') and s[5]
         ]),
-        os.linesep if stack else ''
+        LINESEP if stack else ''
     )
 
-    out = MEMORY_REFERENCE.sub("0xXXXXXXXX", out)
+    out = _scrub_memory_references(out)
 
     out = out.replace(
         "'python.test'", '***EXECUTABLE***').replace(
@@ -296,26 +524,23 @@ def cleanse_java(raw, substitutions):
 
 def cleanse_python(raw, substitutions):
     # Test the specific message
-    out = PYTHON_EXCEPTION.sub(
-        '### EXCEPTION ###{linesep}\\g<exception>: \\g<message>'.format(linesep=os.linesep),
-        raw
-    )
+    out = PYTHON_EXCEPTION.sub(PYTHON_EXCEPTION_REPLACEMENT, raw)
 
     out = PYDEV_CONNECT.sub('', out)
 
     stack = PYTHON_STACK.findall(raw)
     out = '%s%s%s' % (
         out,
-        os.linesep.join(
+        LINESEP.join(
             [
                 "    %s:%s" % (s[0], s[1])
                 for s in stack
             ]
         ),
-        os.linesep if stack else ''
+        LINESEP if stack else ''
     )
     # Normalize memory references from output
-    out = MEMORY_REFERENCE.sub("0xXXXXXXXX", out)
+    out = _scrub_memory_references(out)
 
     # Replace references to the test script with something generic
     out = out.replace("'test.py'", '***EXECUTABLE***')
@@ -340,17 +565,28 @@ class TranspileTestCase(TestCase):
         global _output_dir
         setUpSuite()
         cls.temp_dir = os.path.join(_output_dir, 'temp')
-        classpath = os.pathsep.join([
-            os.path.abspath(os.path.join('dist', 'python-java-testdaemon.jar')),
-            os.path.abspath(os.path.join('dist', 'python-java-support.jar')),
-        ])
         cls.jvm = subprocess.Popen(
-            ["java", "-classpath", classpath, "python.testdaemon.TestDaemon"],
+            ["java", "-classpath", _DAEMON_CLASSPATH, "python.testdaemon.TestDaemon"],
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
             cwd=_output_dir,
         )
+        cls.jvm_reader = _DaemonReader(cls.jvm.stdout)
+
+        # The temp directory, and the per-context subdirectories used by
+        # assertCodeExecution, are reused by every test in the class.
+        for test_dir in (
+                cls.temp_dir,
+                os.path.join(cls.temp_dir, 'global'),
+                os.path.join(cls.temp_dir, 'function')):
+            os.makedirs(test_dir, exist_ok=True)
+
+        # The source last written into each test directory, per module.
+        # Since the directories persist for the whole class, runs that
+        # resubmit identical code (typically the extra_code support
+        # modules of a parametrized test) can skip the class file write.
+        cls._written_sources = {}
 
     @classmethod
     def tearDownClass(cls):
@@ -358,6 +594,21 @@ class TranspileTestCase(TestCase):
             # use communicate here to wait for process to exit
             cls.jvm.communicate("exit".encode("utf-8"))
 
+        # Clean up the test directories where sources and class files
+        # were written. (we have to set ignore_errors for this to work
+        # on Windows)
+        shutil.rmtree(cls.temp_dir, ignore_errors=True)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _compile_block(python):
+        """Compile an adjusted code sample, memoizing the code object.
+
+        Code objects are immutable, so repeated assertions over the same
+        sample can share one.
+        """
+        return compile(python, '<test>', 'exec')
+
     def assertBlock(self, python, java):
         self.maxDiff = None
         dump = False
@@ -365,7 +616,7 @@ class TranspileTestCase(TestCase):
         py_block = PyBlock(parent=PyModule('test', 'test.py'))
         if python:
             python = adjust(python)
-            code = compile(python, '<test>', 'exec')
+            code = self._compile_block(python)
             py_block.extract(code, debug=dump)
 
         java_code = py_block.transpile()
@@ -399,72 +650,35 @@ class TranspileTestCase(TestCase):
             args=None, substitutions=None):
         """"Run code as native python, and under Java and check the output is identical"""
         self.maxDiff = None
-        # ==================================================
-        # Pass 1 - run the code in the global context
-        # ==================================================
-        if run_in_global:
-            try:
-                self.makeTempDir()
-                # Run the code as Python and as Java.
-                adj_code = adjust(code, run_in_function=False)
-                adj_code += '\nprint("%s")\n' % END_OF_CODE_STRING
-                py_out = runAsPython(self.temp_dir, adj_code, extra_code, args=args)
-                java_out = self.runAsJava(adj_code, extra_code, args=args)
-            except Exception as e:
-                self.fail(e)
-            finally:
-                # Clean up the test directory where the class file was written.
-                # (we have to set ignore_errors for this to work on Windows)
-                # Ignoring all errors can be anxiety-inducing so we'll do one more
-                # check on the directory afterwards now.
-                shutil.rmtree(self.temp_dir, ignore_errors=True)
-
-                if os.path.exists(self.temp_dir):
-                    raise IsADirectoryError("{} was unsuccessfully deleted".format
-                                            (self.temp_dir))
-                # print(java_out)
 
-            # Cleanse the Python and Java output, producing a simple
-            # normalized format for exceptions, floats etc.
-            java_out = cleanse_java(java_out, substitutions)
-            py_out = cleanse_python(py_out, substitutions)
+        # Each requested context becomes one run; all runs are submitted
+        # to each daemon as a single batch, from their own subdirectory.
+        contexts = []
+        if run_in_global:
+            contexts.append(('Global context', 'global', False))
+        if run_in_function:
+            contexts.append(('Function context', 'function', True))
 
-            # Confirm that the output of the Java code is the same as the Python code.
-            if message:
-                context = 'Global context: %s' % message
-            else:
-                context = 'Global context'
-            self.assertEqual(java_out, py_out, context)
+        if not contexts:
+            return
 
-            # Confirm that both output strings end with the canary statement
-            if exits_early:
-                if java_out.endswith(END_OF_CODE_STRING_NEWLINE):
-                    self.fail("Java test failed to raise exception \n%s" % java_out)
-                if py_out.endswith(END_OF_CODE_STRING_NEWLINE):
-                    self.fail("Python test failed to raise exception \n%s" % py_out)
-            else:
-                if not java_out.endswith(END_OF_CODE_STRING_NEWLINE):
-                    self.fail("Java test failed prematurely \n%s" % java_out)
-                if not py_out.endswith(END_OF_CODE_STRING_NEWLINE):
-                    self.fail("Python test failed prematurely \n%s" % py_out)
-        # ==================================================
-        # Pass 2 - run the code in a function's context
-        # ==================================================
-        if run_in_function:
-            try:
-                self.makeTempDir()
-                # Run the code as Python and as Java.
-                adj_code = adjust(code, run_in_function=True)
+        try:
+            runs = []
+            for context, subdir, in_function in contexts:
+                adj_code = adjust(code, run_in_function=in_function)
                 adj_code += '\nprint("%s")\n' % END_OF_CODE_STRING
-                py_out = runAsPython(self.temp_dir, adj_code, extra_code, args=args)
-                java_out = self.runAsJava(adj_code, extra_code, args=args)
-            except Exception as e:
-                self.fail(e)
-            finally:
-                # Clean up the test directory where the class file was written.
-                shutil.rmtree(self.temp_dir)
-                # print(java_out)
-
+                runs.append((os.path.join(self.temp_dir, subdir), adj_code))
+
+            # Run the code as Python and as Java. The daemons are
+            # independent processes, so the Python batch runs in a
+            # worker thread while the Java batch runs here.
+            py_batch = _py_runner.submit(runAsPythonBatch, runs, extra_code, args)
+            java_outs = self.runAsJavaBatch(runs, extra_code, args=args)
+            py_outs = py_batch.result()
+        except Exception as e:
+            self.fail(e)
+
+        for (context, subdir, in_function), java_out, py_out in zip(contexts, java_outs, py_outs):
             # Cleanse the Python and Java output, producing a simple
             # normalized format for exceptions, floats etc.
             java_out = cleanse_java(java_out, substitutions)
@@ -472,9 +686,7 @@ class TranspileTestCase(TestCase):
 
             # Confirm that the output of the Java code is the same as the Python code.
             if message:
-                context = 'Function context: %s' % message
-            else:
-                context = 'Function context'
+                context = '%s: %s' % (context, message)
             self.assertEqual(java_out, py_out, context)
 
             # Confirm that both output strings end with the canary statement
@@ -497,102 +709,112 @@ class TranspileTestCase(TestCase):
         """Run code under Java and check the output is as expected"""
         global _output_dir
         self.maxDiff = None
-        try:
-            # ==================================================
-            # Prep - compile any required Java sources
-            # ==================================================
-            # Create the temp directory into which code will be placed
-            java_dir = os.path.join(_output_dir, 'java')
+        # ==================================================
+        # Prep - compile any required Java sources
+        # ==================================================
+        # The java directory is created during setUpSuite, and lives for
+        # the whole suite; compileJava just overwrites sources inside it.
+        java_dir = os.path.join(_output_dir, 'java')
 
+        # Compile the java support code
+        java_compile_out = compileJava(java_dir, java)
+
+        if java_compile_out:
+            self.fail(java_compile_out)
+
+        # Cleanse the Python output, producing a simple
+        # normalized format for exceptions, floats etc.
+        py_out = adjust(out)
+
+        # ==================================================
+        # Pass 1 - run the code in the global context
+        # ==================================================
+        if run_in_global:
             try:
-                os.makedirs(java_dir)
-            except FileExistsError:
-                pass
+                # Run the code as Java.
+                java_out = self.runAsJava(adjust(code), extra_code, args=args)
+            except Exception as e:
+                self.fail(e)
 
-            # Compile the java support code
-            java_compile_out = compileJava(java_dir, java)
+            # Cleanse the Java output, producing a simple
+            # normalized format for exceptions, floats etc.
+            java_out = cleanse_java(java_out, substitutions)
 
-            if java_compile_out:
-                self.fail(java_compile_out)
+            # Confirm that the output of the Java code is the same as the Python code.
+            self.assertEqual(java_out, py_out, 'Global context')
+
+        # ==================================================
+        # Pass 2 - run the code in a function's context
+        # ==================================================
+        if run_in_function:
+            try:
+                # Run the code as Java.
+                java_out = self.runAsJava(
+                    adjust(code, run_in_function=True),
+                    extra_code, args=args)
+            except Exception as e:
+                self.fail(e)
 
-            # Cleanse the Python output, producing a simple
+            # Cleanse the Java output, producing a simple
             # normalized format for exceptions, floats etc.
-            py_out = adjust(out)
-
-            # ==================================================
-            # Pass 1 - run the code in the global context
-            # ==================================================
-            if run_in_global:
-                try:
-                    self.makeTempDir()
-                    # Run the code as Java.
-                    java_out = self.runAsJava(adjust(code), extra_code, args=args)
-                except Exception as e:
-                    self.fail(e)
-                finally:
-                    # Clean up the test directory where the class file was written.
-                    shutil.rmtree(self.temp_dir)
-                    # print(java_out)
-
-                # Cleanse the Java output, producing a simple
-                # normalized format for exceptions, floats etc.
-                java_out = cleanse_java(java_out, substitutions)
-
-                # Confirm that the output of the Java code is the same as the Python code.
-                self.assertEqual(java_out, py_out, 'Global context')
-
-            # ==================================================
-            # Pass 2 - run the code in a function's context
-            # ==================================================
-            if run_in_function:
-                try:
-                    self.makeTempDir()
-                    # Run the code as Java.
-                    java_out = self.runAsJava(
-                        adjust(code, run_in_function=True),
-                        extra_code, args=args)
-                except Exception as e:
-                    self.fail(e)
-                finally:
-                    # Clean up the test directory where the class file was written.
-                    shutil.rmtree(self.temp_dir)
-                    # print(java_out)
-
-                # Cleanse the Java output, producing a simple
-                # normalized format for exceptions, floats etc.
-                java_out = cleanse_java(java_out, substitutions)
-
-                # Confirm that the output of the Java code is the same as the Python code.
-                self.assertEqual(java_out, py_out, 'Function context')
-
-        finally:
-            # Clean up the java directory where the class file was written.
-            if os.path.exists(java_dir):
-                shutil.rmtree(java_dir)
-
-    def makeTempDir(self):
-        """Create a "temp" subdirectory in the class's generated temporary directory if it doesn't currently exist."""
-        try:
-            os.mkdir(self.temp_dir)
-        except FileExistsError:
-            pass
+            java_out = cleanse_java(java_out, substitutions)
 
-    def runAsJava(self, main_code, extra_code=None, args=None, timed=False):
-        """Run a block of Python code as a Java program."""
-        # Output source code into test directory
+            # Confirm that the output of the Java code is the same as the Python code.
+            self.assertEqual(java_out, py_out, 'Function context')
+
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _transpile(filename, code):
+        """Transpile a source string, memoizing the generated class files.
+
+        Parametrized tests resubmit the same extra_code support modules
+        over and over; serializing a cached class file is deterministic
+        (and much cheaper than transpiling), so repeats are free.
+        """
         transpiler = Transpiler(verbosity=0)
+        transpiler.transpile_string(filename, code)
+        return transpiler.classfiles
 
-        # Don't redirect stderr; we want to see any errors from the transpiler
-        # as top level test failures.
-        with capture_output(redirect_stderr=False):
+    def runAsJava(self, main_code, extra_code=None, args=None, timed=False):
+        """Run a block of Python code as a Java program."""
+        return self.runAsJavaBatch(
+            [(self.temp_dir, main_code)], extra_code, args=args, timed=timed
+        )[0]
+
+    def runAsJavaBatch(self, runs, extra_code=None, args=None, timed=False):
+        """Run several blocks of Python code as Java programs.
+
+        ``runs`` is a list of (test_dir, main_code) pairs. The class
+        files for every run are written up front; the commands are then
+        submitted to the JVM daemon in a single write, and their framed
+        outputs read back in order, so a batch costs one round-trip
+        regardless of its size.
+        """
+        global _output_dir
 
-            transpiler.transpile_string("test.py", main_code)
+        for test_dir, main_code in runs:
+            transpiler = Transpiler(verbosity=0)
+            written = self._written_sources.setdefault(test_dir, {})
 
+            modules = [("test.py", main_code)]
             if extra_code:
                 for name, code in extra_code.items():
-                    transpiler.transpile_string("%s.py" % name.replace('.', os.path.sep), adjust(code))
+                    modules.append(("%s.py" % name.replace('.', os.path.sep), adjust(code)))
+
+            # Don't redirect stderr; we want to see any errors from the transpiler
+            # as top level test failures.
+            with capture_output(redirect_stderr=False):
+                for filename, code in modules:
+                    # The class files written for this source on a
+                    # previous run are still on disk; skip the rewrite.
+                    if written.get(filename) == code:
+                        continue
 
-        transpiler.write(self.temp_dir)
+                    transpiler.classfiles.extend(self._transpile(filename, code))
+                    written[filename] = code
+
+            if transpiler.classfiles:
+                transpiler.write(test_dir)
 
         if args is None:
             args = []
@@ -602,56 +824,54 @@ class TranspileTestCase(TestCase):
 
         if len(args) == 0:
 
-            # encode to turn str into bytes-like object
-            self.jvm.stdin.write(("python.test\n").encode("utf-8"))
+            # Each run is preceded by a `chdir` command pointing the
+            # daemon's runtime ClassLoader at that run's directory, so
+            # several runs of python.test can share one write.
+            self.jvm.stdin.write(''.join(
+                "chdir %s\npython.test\n" % (
+                    os.path.relpath(test_dir, _output_dir).replace(os.path.sep, '/'),
+                )
+                for test_dir, main_code in runs
+            ).encode("utf-8"))
             self.jvm.stdin.flush()
 
-            out = ""
-            while True:
-                try:
-                    line = self.jvm.stdout.readline().decode("utf-8")
-                    if line == ".{0}".format(os.linesep):
-                        break
-                    else:
-                        out += line
-                except IOError as e:
-                    continue
-
-            t1_stop = time.perf_counter()
-            t2_stop = time.process_time()
+            outs = [self.jvm_reader.read_frame() for _ in runs]
 
         else:
-            classpath = os.pathsep.join([
-                os.path.abspath(os.path.join('dist', 'python-java-support.jar')),
-                os.path.abspath(os.path.join('java')),
-                os.path.abspath(self.temp_dir),
-            ])
-
-            proc = subprocess.Popen(
-                ["java", "-classpath", classpath, "python.test"] + args,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                cwd=self.temp_dir
-            )
-
-            t1_stop = time.perf_counter()
-            t2_stop = time.process_time()
+            outs = []
+            for test_dir, main_code in runs:
+                classpath = os.pathsep.join([
+                    _SUPPORT_JAR,
+                    _JAVA_SUPPORT_DIR,
+                    os.path.abspath(test_dir),
+                ])
+
+                proc = subprocess.Popen(
+                    ["java", "-classpath", classpath, "python.test"] + args,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    cwd=test_dir
+                )
 
-            out = proc.communicate()[0].decode('utf8')
+                out = proc.communicate()[0].decode('utf8')
 
-            if proc.returncode != 0:
-                raise Exception(
-                    "Java subprocess didn't exit cleanly (exit status %s)\n\n: %s" % (
-                        proc.returncode, out
+                if proc.returncode != 0:
+                    raise Exception(
+                        "Java subprocess didn't exit cleanly (exit status %s)\n\n: %s" % (
+                            proc.returncode, out
+                        )
                     )
-                )
+                outs.append(out)
+
+        t1_stop = time.perf_counter()
+        t2_stop = time.process_time()
 
         if timed:
             print("  Elapsed time: ", (t1_stop-t1_start), " sec")
             print("  CPU process time: ", (t2_stop-t2_start), " sec")
 
-        return out
+        return outs
 
 
 class NotImplementedToExpectedFailure:
@@ -864,14 +1084,105 @@ SAMPLE_SUBSTITUTIONS = {
 }
 
 
-def _unary_test(test_name, operation):
+# Pre-adjusted source templates for the operation test cases below.
+# Sample values are substituted into the adjusted template, rather than
+# re-adjusting the assembled source once per datum.
+_UNARY_TEMPLATE = adjust("""
+    try:
+        print('>>> x = %(x)s')
+        print('>>> %(format)s%(operation)sx')
+        x = %(x)s
+        print(%(format)s%(operation)sx)
+    except Exception as e:
+        print(type(e), ':', e)
+    print()
+    """)
+
+_BINARY_TEMPLATE = adjust("""
+    try:
+        print('>>> x = %(x)s')
+        print('>>> y = %(y)s')
+        print('>>> %(format)s%(operation)s')
+        x = %(x)s
+        y = %(y)s
+        print(%(format)s%(operation)s)
+    except Exception as e:
+        print(type(e), ':', e)
+    print()
+    """)
+
+_INPLACE_TEMPLATE = adjust("""
+    try:
+        print('>>> x = %(x)s')
+        print('>>> y = %(y)s')
+        print('>>> %(operation)s')
+        print('>>> %(format)sx')
+        x = %(x)s
+        y = %(y)s
+        %(operation)s
+        print(%(format)sx)
+    except Exception as e:
+        print(type(e), ':', e)
+    print()
+    """)
+
+_BUILTIN_TEMPLATE = adjust("""
+    try:
+        print('>>> f = %(f)s')
+        print('>>> x = %(x)s')
+        print('>>> %(format)s%(operation)s')
+        f = %(f)s
+        x = %(x)s
+        print(%(format)s%(operation)s)
+    except Exception as e:
+        print(type(e), ':', e)
+    print()
+    """)
+
+_BUILTIN_TWOARG_TEMPLATE = adjust("""
+    try:
+        print('>>> f = %(f)s')
+        print('>>> x = %(x)s')
+        print('>>> y = %(y)s')
+        print('>>> %(format)s%(operation)s')
+        f = %(f)s
+        x = %(x)s
+        y = %(y)s
+        print(%(format)s%(operation)s)
+    except Exception as e:
+        print(type(e), ':', e)
+    print()
+    """)
+
+
+def _operation_test(assert_name, operation, examples=None, examples2=None):
+    """Create a test method exercising one operation against sample data.
+
+    A single factory serves every operation test case class; the methods
+    it generates stay distinct (one per operation and datatype) rather
+    than collapsing into a subTest loop, because the per-method
+    not_implemented/expectedFailure bookkeeping in
+    NotImplementedToExpectedFailure keys off the method name.
+    """
     def func(self):
-        self.assertUnaryOperation(
-            x_values=SAMPLE_DATA[self.data_type],
-            operation=operation,
-            format=self.format,
-            substitutions=getattr(self, 'substitutions', SAMPLE_SUBSTITUTIONS)
-        )
+        params = {
+            'operation': operation,
+            'format': self.format,
+            'substitutions': getattr(self, 'substitutions', SAMPLE_SUBSTITUTIONS),
+        }
+        if assert_name == 'assertUnaryOperation':
+            params['x_values'] = SAMPLE_DATA[self.data_type]
+        elif assert_name in ('assertBinaryOperation', 'assertInplaceOperation'):
+            params['x_values'] = SAMPLE_DATA[self.data_type]
+            params['y_values'] = examples
+        elif assert_name == 'assertBuiltinFunction':
+            params['f_values'] = self.functions
+            params['x_values'] = examples
+        else:
+            params['f_values'] = self.functions
+            params['x_values'] = examples
+            params['y_values'] = examples2
+        getattr(self, assert_name)(**params)
     return func
 
 
@@ -881,21 +1192,11 @@ class UnaryOperationTestCase(NotImplementedToExpectedFailure):
     def assertUnaryOperation(self, x_values, operation, format, substitutions):
         self.assertCodeExecution(
             '##################################################\n'.join(
-                adjust("""
-                    try:
-                        print('>>> x = %(x)s')
-                        print('>>> %(format)s%(operation)sx')
-                        x = %(x)s
-                        print(%(format)s%(operation)sx)
-                    except Exception as e:
-                        print(type(e), ':', e)
-                    print()
-                    """ % {
-                        'x': x,
-                        'operation': operation,
-                        'format': format,
-                    }
-                )
+                _UNARY_TEMPLATE % {
+                    'x': x,
+                    'operation': operation,
+                    'format': format,
+                }
                 for x in x_values
             ),
             "Error running %s" % operation,
@@ -903,22 +1204,12 @@ class UnaryOperationTestCase(NotImplementedToExpectedFailure):
             run_in_function=False,
         )
 
-    test_unary_positive = _unary_test('test_unary_positive', '+')
-    test_unary_negative = _unary_test('test_unary_negative', '-')
-    test_unary_not = _unary_test('test_unary_not', 'not ')
-    test_unary_invert = _unary_test('test_unary_invert', '~')
-
-
-def _binary_test(test_name, operation, examples):
-    def func(self):
-        self.assertBinaryOperation(
-            x_values=SAMPLE_DATA[self.data_type],
-            y_values=examples,
-            operation=operation,
-            format=self.format,
-            substitutions=getattr(self, 'substitutions', SAMPLE_SUBSTITUTIONS)
-        )
-    return func
+    for op_name, operation in (
+            ('positive', '+'),
+            ('negative', '-'),
+            ('not', 'not '),
+            ('invert', '~')):
+        vars()['test_unary_%s' % op_name] = _operation_test('assertUnaryOperation', operation)
 
 
 class BinaryOperationTestCase(NotImplementedToExpectedFailure):
@@ -933,24 +1224,12 @@ class BinaryOperationTestCase(NotImplementedToExpectedFailure):
 
         self.assertCodeExecution(
             '##################################################\n'.join(
-                adjust("""
-                    try:
-                        print('>>> x = %(x)s')
-                        print('>>> y = %(y)s')
-                        print('>>> %(format)s%(operation)s')
-                        x = %(x)s
-                        y = %(y)s
-                        print(%(format)s%(operation)s)
-                    except Exception as e:
-                        print(type(e), ':', e)
-                    print()
-                    """ % {
-                        'x': x,
-                        'y': y,
-                        'operation': operation,
-                        'format': format,
-                    }
-                )
+                _BINARY_TEMPLATE % {
+                    'x': x,
+                    'y': y,
+                    'operation': operation,
+                    'format': format,
+                }
                 for x, y in data
             ),
             "Error running %s" % operation,
@@ -959,45 +1238,37 @@ class BinaryOperationTestCase(NotImplementedToExpectedFailure):
         )
 
     for datatype, examples in SAMPLE_DATA.items():
-        vars()['test_add_%s' % datatype] = _binary_test('test_add_%s' % datatype, 'x + y', examples)
-        vars()['test_subtract_%s' % datatype] = _binary_test('test_subtract_%s' % datatype, 'x - y', examples)
-        vars()['test_multiply_%s' % datatype] = _binary_test('test_multiply_%s' % datatype, 'x * y', examples)
-        vars()['test_floor_divide_%s' % datatype] = _binary_test('test_floor_divide_%s' % datatype, 'x // y', examples)
-        vars()['test_true_divide_%s' % datatype] = _binary_test('test_true_divide_%s' % datatype, 'x / y', examples)
-        vars()['test_modulo_%s' % datatype] = _binary_test('test_modulo_%s' % datatype, 'x % y', examples)
-        vars()['test_power_%s' % datatype] = _binary_test('test_power_%s' % datatype, 'x ** y', examples)
-        vars()['test_subscr_%s' % datatype] = _binary_test('test_subscr_%s' % datatype, 'x[y]', examples)
-        vars()['test_lshift_%s' % datatype] = _binary_test('test_lshift_%s' % datatype, 'x << y', examples)
-        vars()['test_rshift_%s' % datatype] = _binary_test('test_rshift_%s' % datatype, 'x >> y', examples)
-        vars()['test_and_%s' % datatype] = _binary_test('test_and_%s' % datatype, 'x & y', examples)
-        vars()['test_xor_%s' % datatype] = _binary_test('test_xor_%s' % datatype, 'x ^ y', examples)
-        vars()['test_or_%s' % datatype] = _binary_test('test_or_%s' % datatype, 'x | y', examples)
-
-        vars()['test_lt_%s' % datatype] = _binary_test('test_lt_%s' % datatype, 'x < y', examples)
-        vars()['test_le_%s' % datatype] = _binary_test('test_le_%s' % datatype, 'x <= y', examples)
-        vars()['test_gt_%s' % datatype] = _binary_test('test_gt_%s' % datatype, 'x > y', examples)
-        vars()['test_ge_%s' % datatype] = _binary_test('test_ge_%s' % datatype, 'x >= y', examples)
-        vars()['test_eq_%s' % datatype] = _binary_test('test_eq_%s' % datatype, 'x == y', examples)
-        vars()['test_ne_%s' % datatype] = _binary_test('test_ne_%s' % datatype, 'x != y', examples)
-
-        vars()['test_direct_lt_%s' % datatype] = _binary_test('test_lt_%s' % datatype, 'x.__lt__(y)', examples)
-        vars()['test_direct_le_%s' % datatype] = _binary_test('test_le_%s' % datatype, 'x.__le__(y)', examples)
-        vars()['test_direct_gt_%s' % datatype] = _binary_test('test_gt_%s' % datatype, 'x.__gt__(y)', examples)
-        vars()['test_direct_ge_%s' % datatype] = _binary_test('test_ge_%s' % datatype, 'x.__ge__(y)', examples)
-        vars()['test_direct_eq_%s' % datatype] = _binary_test('test_eq_%s' % datatype, 'x.__eq__(y)', examples)
-        vars()['test_direct_ne_%s' % datatype] = _binary_test('test_ne_%s' % datatype, 'x.__ne__(y)', examples)
-
-
-def _inplace_test(test_name, operation, examples):
-    def func(self):
-        self.assertInplaceOperation(
-            x_values=SAMPLE_DATA[self.data_type],
-            y_values=examples,
-            operation=operation,
-            format=self.format,
-            substitutions=getattr(self, 'substitutions', SAMPLE_SUBSTITUTIONS)
-        )
-    return func
+        for op_name, operation in (
+                ('add', 'x + y'),
+                ('subtract', 'x - y'),
+                ('multiply', 'x * y'),
+                ('floor_divide', 'x // y'),
+                ('true_divide', 'x / y'),
+                ('modulo', 'x % y'),
+                ('power', 'x ** y'),
+                ('subscr', 'x[y]'),
+                ('lshift', 'x << y'),
+                ('rshift', 'x >> y'),
+                ('and', 'x & y'),
+                ('xor', 'x ^ y'),
+                ('or', 'x | y'),
+
+                ('lt', 'x < y'),
+                ('le', 'x <= y'),
+                ('gt', 'x > y'),
+                ('ge', 'x >= y'),
+                ('eq', 'x == y'),
+                ('ne', 'x != y'),
+
+                ('direct_lt', 'x.__lt__(y)'),
+                ('direct_le', 'x.__le__(y)'),
+                ('direct_gt', 'x.__gt__(y)'),
+                ('direct_ge', 'x.__ge__(y)'),
+                ('direct_eq', 'x.__eq__(y)'),
+                ('direct_ne', 'x.__ne__(y)')):
+            vars()['test_%s_%s' % (op_name, datatype)] = _operation_test(
+                'assertBinaryOperation', operation, examples
+            )
 
 
 class InplaceOperationTestCase(NotImplementedToExpectedFailure):
@@ -1012,26 +1283,12 @@ class InplaceOperationTestCase(NotImplementedToExpectedFailure):
 
         self.assertCodeExecution(
             '##################################################\n'.join(
-                adjust("""
-                    try:
-                        print('>>> x = %(x)s')
-                        print('>>> y = %(y)s')
-                        print('>>> %(operation)s')
-                        print('>>> %(format)sx')
-                        x = %(x)s
-                        y = %(y)s
-                        %(operation)s
-                        print(%(format)sx)
-                    except Exception as e:
-                        print(type(e), ':', e)
-                    print()
-                    """ % {
-                        'x': x,
-                        'y': y,
-                        'operation': operation,
-                        'format': format,
-                    }
-                )
+                _INPLACE_TEMPLATE % {
+                    'x': x,
+                    'y': y,
+                    'operation': operation,
+                    'format': format,
+                }
                 for x, y in data
             ),
             "Error running %s" % operation,
@@ -1040,78 +1297,22 @@ class InplaceOperationTestCase(NotImplementedToExpectedFailure):
         )
 
     for datatype, examples in SAMPLE_DATA.items():
-        vars()['test_add_%s' % datatype] = _inplace_test(
-            'test_add_%s' % datatype,
-            'x += y',
-            examples
-        )
-        vars()['test_subtract_%s' % datatype] = _inplace_test(
-            'test_subtract_%s' % datatype,
-            'x -= y',
-            examples
-        )
-        vars()['test_multiply_%s' % datatype] = _inplace_test(
-            'test_multiply_%s' % datatype,
-            'x *= y',
-            examples
-        )
-        vars()['test_floor_divide_%s' % datatype] = _inplace_test(
-            'test_floor_divide_%s' % datatype,
-            'x //= y',
-            examples
-        )
-        vars()['test_true_divide_%s' % datatype] = _inplace_test(
-            'test_true_divide_%s' % datatype,
-            'x /= y',
-            examples
-        )
-        vars()['test_modulo_%s' % datatype] = _inplace_test(
-            'test_modulo_%s' % datatype,
-            'x %= y',
-            examples
-        )
-        vars()['test_power_%s' % datatype] = _inplace_test(
-            'test_power_%s' % datatype,
-            'x **= y',
-            examples
-        )
-        vars()['test_lshift_%s' % datatype] = _inplace_test(
-            'test_lshift_%s' % datatype,
-            'x <<= y',
-            examples
-        )
-        vars()['test_rshift_%s' % datatype] = _inplace_test(
-            'test_rshift_%s' % datatype,
-            'x >>= y',
-            examples
-        )
-        vars()['test_and_%s' % datatype] = _inplace_test(
-            'test_and_%s' % datatype,
-            'x &= y',
-            examples
-        )
-        vars()['test_xor_%s' % datatype] = _inplace_test(
-            'test_xor_%s' % datatype,
-            'x ^= y',
-            examples
-        )
-        vars()['test_or_%s' % datatype] = _inplace_test(
-            'test_or_%s' % datatype,
-            'x |= y',
-            examples
-        )
-
-
-def _builtin_test(test_name, operation, examples):
-    def func(self):
-        self.assertBuiltinFunction(
-            x_values=examples,
-            f_values=self.functions,
-            operation=operation,
-            format=self.format,
-            substitutions=getattr(self, 'substitutions', SAMPLE_SUBSTITUTIONS)
-        )
-    return func
+        for op_name, operation in (
+                ('add', 'x += y'),
+                ('subtract', 'x -= y'),
+                ('multiply', 'x *= y'),
+                ('floor_divide', 'x //= y'),
+                ('true_divide', 'x /= y'),
+                ('modulo', 'x %= y'),
+                ('power', 'x **= y'),
+                ('lshift', 'x <<= y'),
+                ('rshift', 'x >>= y'),
+                ('and', 'x &= y'),
+                ('xor', 'x ^= y'),
+                ('or', 'x |= y')):
+            vars()['test_%s_%s' % (op_name, datatype)] = _operation_test(
+                'assertInplaceOperation', operation, examples
+            )
 
 
 class BuiltinFunctionTestCase(NotImplementedToExpectedFailure):
@@ -1125,24 +1326,12 @@ class BuiltinFunctionTestCase(NotImplementedToExpectedFailure):
 
         self.assertCodeExecution(
             '##################################################\n'.join(
-                adjust("""
-                    try:
-                        print('>>> f = %(f)s')
-                        print('>>> x = %(x)s')
-                        print('>>> %(format)s%(operation)s')
-                        f = %(f)s
-                        x = %(x)s
-                        print(%(format)s%(operation)s)
-                    except Exception as e:
-                        print(type(e), ':', e)
-                    print()
-                    """ % {
-                        'f': f,
-                        'x': x,
-                        'operation': operation,
-                        'format': format,
-                    }
-                )
+                _BUILTIN_TEMPLATE % {
+                    'f': f,
+                    'x': x,
+                    'operation': operation,
+                    'format': format,
+                }
                 for f, x in data
             ),
             "Error running %s" % operation,
@@ -1151,20 +1340,7 @@ class BuiltinFunctionTestCase(NotImplementedToExpectedFailure):
         )
 
     for datatype, examples in SAMPLE_DATA.items():
-        vars()['test_%s' % datatype] = _builtin_test('test_%s' % datatype, 'f(x)', examples)
-
-
-def _builtin_twoarg_test(test_name, operation, examples1, examples2):
-    def func(self):
-        self.assertBuiltinTwoargFunction(
-            f_values=self.functions,
-            x_values=examples1,
-            y_values=examples2,
-            operation=operation,
-            format=self.format,
-            substitutions=getattr(self, 'substitutions', SAMPLE_SUBSTITUTIONS)
-        )
-    return func
+        vars()['test_%s' % datatype] = _operation_test('assertBuiltinFunction', 'f(x)', examples)
 
 
 class BuiltinTwoargFunctionTestCase(NotImplementedToExpectedFailure):
@@ -1179,27 +1355,13 @@ class BuiltinTwoargFunctionTestCase(NotImplementedToExpectedFailure):
 
         self.assertCodeExecution(
             '##################################################\n'.join(
-                adjust("""
-                    try:
-                        print('>>> f = %(f)s')
-                        print('>>> x = %(x)s')
-                        print('>>> y = %(y)s')
-                        print('>>> %(format)s%(operation)s')
-                        f = %(f)s
-                        x = %(x)s
-                        y = %(y)s
-                        print(%(format)s%(operation)s)
-                    except Exception as e:
-                        print(type(e), ':', e)
-                    print()
-                    """ % {
-                        'f': f,
-                        'x': x,
-                        'y': y,
-                        'operation': operation,
-                        'format': format,
-                    }
-                )
+                _BUILTIN_TWOARG_TEMPLATE % {
+                    'f': f,
+                    'x': x,
+                    'y': y,
+                    'operation': operation,
+                    'format': format,
+                }
                 for f, x, y in data
             ),
             "Error running %s" % operation,
@@ -1209,7 +1371,6 @@ class BuiltinTwoargFunctionTestCase(NotImplementedToExpectedFailure):
 
     for datatype1, examples1 in SAMPLE_DATA.items():
         for datatype2, examples2 in SAMPLE_DATA.items():
-            vars()['test_%s_%s' % (datatype1, datatype2)] = _builtin_twoarg_test(
-                'test_%s_%s' % (datatype1, datatype2),
-                'f(x, y)', examples1, examples2
+            vars()['test_%s_%s' % (datatype1, datatype2)] = _operation_test(
+                'assertBuiltinTwoargFunction', 'f(x, y)', examples1, examples2
             )
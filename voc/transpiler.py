@@ -50,10 +50,7 @@ class Transpiler:
             dirname = os.path.join(*(basedir + namespace.split('.')))
             classfilename = os.path.join(dirname, '%s.class' % class_name)
 
-            try:
-                os.makedirs(os.path.dirname(classfilename))
-            except FileExistsError:
-                pass
+            os.makedirs(os.path.dirname(classfilename), exist_ok=True)
 
             if self.verbosity:
                 print("Writing %s ..." % classfilename)